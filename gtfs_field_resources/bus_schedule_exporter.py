@@ -17,6 +17,7 @@ Configuration:
 - **Route Selection**: Choose specific route short names to process or set to 'all' to
     include all routes.
 - **Time Format**: Select between 12-hour or 24-hour time formats for the output.
+- **Worker Processes**: Set how many route/schedule workbooks are built in parallel.
 
 Features:
 ---------
@@ -32,12 +33,26 @@ Usage:
 2. **Run the Script**: Execute the script using a Python interpreter.
 """
 
+import logging
+import multiprocessing
 import os
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+import numpy as np
 import pandas as pd
-from openpyxl.utils import get_column_letter
-from openpyxl.styles import Alignment
+from pandas.api.types import union_categoricals
+import xlsxwriter
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pa_compute
+    from pyarrow import csv as pa_csv
+except ImportError:  # Fall back to the pandas C parser
+    pa = None
+    pa_compute = None
+    pa_csv = None
 
 # ==============================
 # CONFIGURATION SECTION - CUSTOMIZE HERE
@@ -70,14 +85,116 @@ MISSING_TIME = "---"
 # Maximum column width for Excel output (used to wrap long headers)
 MAX_COLUMN_WIDTH = 30  # Adjust as needed  (Renamed to comply with Pylint)
 
+# Number of worker processes used to build route/schedule workbooks in parallel.
+# None picks automatically: all CPU cores where workers are forked (Linux), which share
+# the loaded GTFS tables with the main process, and 1 elsewhere. Workers that are not
+# forked (the default on Windows and macOS) each re-read and hold the whole feed, so
+# peak memory grows with every worker added; raise it there only if memory allows.
+# Set to 1 to process them one at a time in the main process
+MAX_WORKERS = None
+
+# Logging for data warnings; raise the level (e.g. logging.ERROR) to silence them
+logging.basicConfig(level=logging.WARNING, format='%(levelname)s: %(message)s')
+
 # ==============================
 # END OF CONFIGURATION SECTION
 # ==============================
 
+# ==============================
+# SCHEDULE TYPE DEFINITIONS
+# ==============================
+
+DAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+
+# Schedule type for each set of service days; other combinations are 'Special'
+SCHEDULE_BY_DAYSET = {
+    frozenset({'monday', 'tuesday', 'wednesday', 'thursday', 'friday'}): 'Weekday',
+    frozenset({'monday', 'tuesday', 'wednesday', 'thursday'}): 'Weekday_except_Friday',
+    frozenset({'saturday'}): 'Saturday',
+    frozenset({'sunday'}): 'Sunday',
+    frozenset({'saturday', 'sunday'}): 'Weekend',
+    frozenset({'friday', 'saturday'}): 'Friday-Saturday',
+    frozenset(DAYS): 'Daily',
+}
+
+# Columns read from each GTFS file; all others are skipped at load time
+TRIPS_COLUMNS = ['route_id', 'service_id', 'trip_id', 'trip_headsign', 'direction_id']
+STOP_TIMES_COLUMNS = ['trip_id', 'stop_id', 'stop_sequence', 'departure_time', 'timepoint']
+ROUTES_COLUMNS = ['route_id', 'route_short_name']
+STOPS_COLUMNS = ['stop_id', 'stop_name']
+CALENDAR_COLUMNS = ['service_id', *DAYS]
+
+# Chunk size used when stop_times.txt is streamed and filtered to its timepoints:
+# rows per chunk for the pandas parser, bytes per block for the PyArrow reader
+READ_CHUNK_ROWS = 500_000
+READ_BLOCK_BYTES = 64 << 20
+
 # ==============================
 # UTILITY FUNCTIONS
 # ==============================
 
+def read_gtfs_csv(file_path, columns, keep_rows=None):
+    """
+    Reads the given columns of a GTFS file as strings, skipping any that are absent.
+    Uses the multi-threaded PyArrow CSV reader when installed, else the pandas C parser.
+    If 'keep_rows' is a (column, value) pair and that column is present, the file is
+    streamed in chunks and only rows where the column equals the value are kept, so
+    peak memory is bounded by the rows kept rather than by the whole file.
+    """
+    header = pd.read_csv(file_path, nrows=0).columns
+    usecols = [col for col in columns if col in header]
+    if keep_rows is not None and keep_rows[0] not in usecols:
+        keep_rows = None
+
+    if pa_csv is None:
+        if keep_rows is None:
+            return pd.read_csv(file_path, usecols=usecols, dtype=str)
+        filter_column, filter_value = keep_rows
+        chunks = pd.read_csv(file_path, usecols=usecols, dtype=str, chunksize=READ_CHUNK_ROWS)
+        return pd.concat(
+            [chunk[chunk[filter_column] == filter_value] for chunk in chunks], ignore_index=True
+        )
+
+    convert_options = pa_csv.ConvertOptions(
+        include_columns=usecols,
+        column_types={col: pa.string() for col in usecols},
+        strings_can_be_null=True
+    )
+    if keep_rows is None:
+        return pa_csv.read_csv(file_path, convert_options=convert_options).to_pandas()
+
+    filter_column, filter_value = keep_rows
+    reader = pa_csv.open_csv(
+        file_path,
+        read_options=pa_csv.ReadOptions(block_size=READ_BLOCK_BYTES),
+        convert_options=convert_options
+    )
+    keep_expression = pa_compute.field(filter_column) == filter_value
+    filtered_tables = [
+        pa.Table.from_batches([batch]).filter(keep_expression) for batch in reader
+    ]
+    return pa.concat_tables(
+        [pa.Table.from_batches([], schema=reader.schema)] + filtered_tables
+    ).to_pandas()
+
+def shared_category_dtype(*columns):
+    """
+    Returns a CategoricalDtype covering the values of all given Series, so that
+    ID columns from different GTFS files share one set of integer codes.
+    """
+    categories = union_categoricals(
+        [pd.Categorical(column) for column in columns], sort_categories=True
+    ).categories
+    return pd.CategoricalDtype(categories)
+
+def gather_rows(row_index, keys):
+    """
+    Concatenates the row positions stored in 'row_index' (e.g. from groupby().indices)
+    for each of the given keys, skipping keys that are absent.
+    """
+    positions = [row_index[key] for key in keys if key in row_index]
+    return np.concatenate(positions) if positions else np.empty(0, dtype=np.intp)
+
 def time_to_minutes(time_str):
     """
     Converts a time string to total minutes since midnight.
@@ -138,10 +255,11 @@ def check_schedule_order(df, ordered_stop_names, route_short_name, schedule_type
             if current_time is None:
                 continue
             if last_time is not None and current_time < last_time:
-                print(
-                    f"⚠️ Time order violation in Route '{route_short_name}', "
-                    f"Schedule '{schedule_type}', Direction '{direction_id}', "
-                    f"Trip '{row['Trip Headsign']}': '{stop}' time {time_str} is earlier than previous stop."
+                logging.warning(
+                    "⚠️ Time order violation in Route '%s', Schedule '%s', Direction '%s', "
+                    "Trip '%s': '%s' time %s is earlier than previous stop.",
+                    route_short_name, schedule_type, direction_id, row['Trip Headsign'],
+                    stop, time_str
                 )
                 violations = True
                 break  # Warn once per trip
@@ -156,10 +274,10 @@ def check_schedule_order(df, ordered_stop_names, route_short_name, schedule_type
             if current_time is None:
                 continue
             if last_time is not None and current_time < last_time:
-                print(
-                    f"⚠️ Time order violation in Route '{route_short_name}', "
-                    f"Schedule '{schedule_type}', Direction '{direction_id}', "
-                    f"Stop '{stop}': time {time_str} is earlier than previous trip."
+                logging.warning(
+                    "⚠️ Time order violation in Route '%s', Schedule '%s', Direction '%s', "
+                    "Stop '%s': time %s is earlier than previous trip.",
+                    route_short_name, schedule_type, direction_id, stop, time_str
                 )
                 violations = True
                 break  # Warn once per stop
@@ -168,64 +286,54 @@ def check_schedule_order(df, ordered_stop_names, route_short_name, schedule_type
     if not violations:
         print("✅ Schedule order check passed.")
 
-def adjust_time(time_str, time_format='24'):
+def convert_departure_times(departure_times, time_format='24'):
     """
-    Adjusts time strings to the desired format.
+    Parses a Series of 'HH:MM[:SS]' departure times in one vectorized pass.
+    Returns a DataFrame indexed like 'departure_times' with 'departure_time_display'
+    and 'departure_seconds' (since midnight); both are missing for invalid times.
     If time_format is '24', keeps hours as is without wrapping.
     If time_format is '12', converts to 12-hour format with AM/PM, unless hours >=24.
-    Returns None if the format is invalid.
     """
-    parts = time_str.strip().split(":")
-    if len(parts) >= 2:
-        try:
-            hours = int(parts[0])
-            minutes = int(parts[1])
-
-            if time_format == '12':
-                if hours >= 24:
-                    # Cannot convert hours >=24 to 12-hour format meaningfully
-                    print(f"Warning: Cannot convert time '{time_str}' to 12-hour format. Keeping as is.")
-                    return time_str  # Or choose to set to '---' or another placeholder
-                period = 'AM' if hours < 12 else 'PM'
-                adjusted_hour = hours % 12
-                if adjusted_hour == 0:
-                    adjusted_hour = 12
-                formatted_time = f"{adjusted_hour}:{minutes:02} {period}"
-                return formatted_time
-            else:
-                # Keep hours as is for 24-hour format without wrapping
-                return f"{hours:02}:{minutes:02}"
-        except ValueError:
-            print(f"Warning: Invalid time format encountered: '{time_str}'")
-            return None
+    parts = departure_times.str.extract(r'^\s*([+-]?[0-9]+)\s*:\s*([+-]?[0-9]+)\s*(?::|$)')
+    valid = parts.notna().all(axis=1)
+    hours = parts.loc[valid, 0].astype(np.int64)
+    minutes = parts.loc[valid, 1].astype(np.int64)
+    minutes_str = minutes.astype(str).str.zfill(2)
+
+    if time_format == '12':
+        period = pd.Series(np.where(hours < 12, ' AM', ' PM'), index=hours.index)
+        adjusted_hours = (hours % 12).replace(0, 12)
+        display = adjusted_hours.astype(str) + ':' + minutes_str + period
+        # Cannot convert hours >=24 to 12-hour format meaningfully
+        past_midnight = hours >= 24
+        for time_str in departure_times[valid][past_midnight].unique():
+            logging.warning("Cannot convert time '%s' to 12-hour format. Keeping as is.", time_str)
+        display = display.mask(past_midnight, departure_times[valid])
     else:
-        print(f"Warning: Invalid time format encountered: '{time_str}'")
-        return None
+        # Keep hours as is for 24-hour format without wrapping
+        display = hours.astype(str).str.zfill(2) + ':' + minutes_str
 
-def get_ordered_stops(direction_id, relevant_trips):
+    return pd.DataFrame({
+        'departure_time_display': display,
+        'departure_seconds': hours * 3600 + minutes * 60,
+    }).reindex(departure_times.index)
+
+def get_ordered_stops(direction_id, all_stops, stop_name_map):
     """
-    Retrieves and orders the stops for the given direction_id from 'relevant_trips'.
+    Retrieves and orders the stops for the given direction_id from 'all_stops', the
+    timepoint rows of the direction's trips sorted by trip_id and stop_sequence,
+    naming them through 'stop_name_map'.
     Returns a tuple of (ordered_stop_names, unique_stops DataFrame).
     """
-    relevant_trips_direction = relevant_trips[relevant_trips['direction_id'] == direction_id]
-
-    if relevant_trips_direction.empty:
-        print(f"Warning: No trips found for direction_id '{direction_id}'.")
-        return [], []
-
-    all_stops = timepoints[timepoints['trip_id'].isin(relevant_trips_direction['trip_id'])]
-    all_stops = all_stops.sort_values(['trip_id', 'stop_sequence'])
-
     if all_stops.empty:
-        print(f"Warning: No stop times found for direction_id '{direction_id}'.")
+        logging.warning("No stop times found for direction_id '%s'.", direction_id)
         return [], []
 
     # Keep all occurrences of each stop (no drop_duplicates on stop_id)
     unique_stops = all_stops[['stop_id', 'stop_sequence']].drop_duplicates().sort_values('stop_sequence')
 
-    stop_names = stops.set_index('stop_id')['stop_name']
     ordered_stop_names = [
-        f"{stop_names.get(stop_id, f'Unknown Stop ID {stop_id}')} ({seq})"
+        f"{stop_name_map.get(stop_id, f'Unknown Stop ID {stop_id}')} ({seq})"
         for stop_id, seq in zip(unique_stops['stop_id'], unique_stops['stop_sequence'])
     ]
 
@@ -236,156 +344,112 @@ def map_service_id_to_schedule(service_row):
     Maps a service_id row to a schedule type based on days served.
     Includes 'Weekday except Friday'.
     """
-    days = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
-    served_days = [day for day in days if service_row.get(day, '0') == '1']
-
-    # Define day sets for different schedule types
-    weekday = {'monday', 'tuesday', 'wednesday', 'thursday', 'friday'}
-    weekday_except_friday = {'monday', 'tuesday', 'wednesday', 'thursday'}
-    saturday = {'saturday'}
-    sunday = {'sunday'}
-    weekend = {'saturday', 'sunday'}
-    daily = set(days)
+    served_set = frozenset(day for day in DAYS if service_row.get(day, '0') == '1')
 
-    if not served_days:
+    if not served_set:
         return 'Holiday'  # Or another appropriate label
 
-    served_set = set(served_days)
-
-    if served_set == weekday:
-        return 'Weekday'
-    elif served_set == weekday_except_friday:
-        return 'Weekday_except_Friday'
-    elif served_set == saturday:
-        return 'Saturday'
-    elif served_set == sunday:
-        return 'Sunday'
-    elif served_set == weekend:
-        return 'Weekend'
-    elif served_set == {'friday', 'saturday'}:
-        return 'Friday-Saturday'
-    elif served_set == daily:
-        return 'Daily'
-    else:
-        return 'Special'  # For other combinations
+    return SCHEDULE_BY_DAYSET.get(served_set, 'Special')  # 'Special' for other combinations
+
+def build_schedule_type_lookup():
+    """
+    Builds a 128-entry array mapping a 7-bit service-day code (bit i set when
+    DAYS[i] is served) to its schedule type.
+    """
+    return np.array([
+        map_service_id_to_schedule(
+            {day: '1' if code & (1 << i) else '0' for i, day in enumerate(DAYS)}
+        )
+        for code in range(1 << len(DAYS))
+    ], dtype=object)
 
 def process_trips_for_direction(
     relevant_trips_direction,
+    trip_stops,
     ordered_stop_names,
     unique_stops,
     time_format,
     route_short_name,
     schedule_type,
-    direction_id
+    direction_id,
+    route_name_map
 ):
     """
     Processes trips for a specific direction_id and returns a DataFrame without 'Trip ID'.
+    'trip_stops' holds the timepoint rows of these trips, sorted by trip_id and stop_sequence.
     Each stop occurrence is preserved, ensuring repeated visits to the same stop appear
     as distinct columns. Sorts trips based on the latest departure time in 24-hour format.
     Checks for sequential departure times and prints warnings if inconsistencies are found.
     Also performs schedule order checks across rows and columns.
+    'route_name_map' gives the route short name shown for each route_id.
     """
 
     # If there are no trips in this direction, skip
     if relevant_trips_direction.empty:
-        print("Warning: No trips to process for this direction.")
+        logging.warning("No trips to process for this direction.")
         return pd.DataFrame()
 
-    # Build an index map to quickly find the right column for each stop_sequence
-    ordered_stop_ids = unique_stops['stop_id'].tolist()
-    ordered_stop_sequences = unique_stops['stop_sequence'].tolist()
-    stop_index_map = {seq: i for i, seq in enumerate(ordered_stop_sequences)}
-
-    output_data = []
-
-    # Iterate over each trip in the chosen direction
-    for trip_id, group in timepoints[
-        timepoints['trip_id'].isin(relevant_trips_direction['trip_id'])
-    ].groupby('trip_id'):
-        # Pull out info about this trip
-        trip_info = relevant_trips_direction[relevant_trips_direction['trip_id'] == trip_id].iloc[0]
-        route_name = routes[routes['route_id'] == trip_info['route_id']]['route_short_name'].values[0]
-        trip_headsign = trip_info.get('trip_headsign', '')
-
-        # Initialize the row with route_name, direction_id, trip_headsign
-        row = [route_name, trip_info['direction_id'], trip_headsign]
-
-        # Fill schedule times with the placeholder
-        schedule_times = [MISSING_TIME] * len(ordered_stop_ids)
-        valid_departure_times_24 = []
-
-        # Populate schedule times in the correct columns
-        for _idx, stop in group.iterrows():
-            departure_str = stop['departure_time'].strip()
-            time_str_display = adjust_time(departure_str, time_format)
-            time_str_24 = adjust_time(departure_str, '24')
-
-            if time_str_display is None or time_str_24 is None:
-                print(
-                    f"Warning: Invalid time format '{stop['departure_time']}' "
-                    f"in trip_id '{trip_id}' at stop_id '{stop['stop_id']}'"
-                )
-                continue
+    # unique_stops is sorted by stop_sequence, so each stop's column can be found with a
+    # binary search; side='right' picks the last column when a sequence number repeats
+    ordered_stop_sequences = unique_stops['stop_sequence'].to_numpy()
 
-            seq = stop['stop_sequence']
-            index = stop_index_map[seq]
-            schedule_times[index] = time_str_display
-            valid_departure_times_24.append(time_str_24)
-
-        # Determine the sorting time based on the maximum departure time
-        if valid_departure_times_24:
-            try:
-                # Use pd.to_timedelta which can handle hours >=24
-                departure_timedeltas = [
-                    pd.to_timedelta(t + ':00') for t in valid_departure_times_24
-                ]
-                max_sort_time = max(departure_timedeltas)
-            except Exception as e:
-                max_sort_time = pd.to_timedelta('00:00')
-                print(
-                    f"Warning: Failed to determine maximum departure time for trip_id '{trip_id}'. "
-                    f"Defaulting to '00:00'. Error: {e}"
-                )
-        else:
-            # If no valid times, assign a large timedelta so this trip sorts to the bottom
-            max_sort_time = pd.to_timedelta('9999:00:00')
-
-        # Add schedule times and the sort time to the row
-        row.extend(schedule_times)
-        row.append(max_sort_time)
-
-        # Append to output_data
-        output_data.append(row)
-
-        # Check for sequential times within the trip
-        times_in_seconds = []
-        for t_str in valid_departure_times_24:
-            total_minutes = time_to_minutes(t_str)
-            if total_minutes is not None:
-                seconds = total_minutes * 60
-                times_in_seconds.append(seconds)
-            else:
-                print(f"Warning: Failed to parse time '{t_str}' in trip_id '{trip_id}'.")
-
-        for i in range(1, len(times_in_seconds)):
-            if times_in_seconds[i] < times_in_seconds[i - 1]:
-                print(
-                    f"⚠️ Non-sequential departure times in trip_id '{trip_id}' for "
-                    f"Route '{route_short_name}', Schedule '{schedule_type}', Direction '{direction_id}'. "
-                    f"Stop {i + 1} is earlier than Stop {i}."
-                )
-                break  # Warn once per trip
+    # Index trip attributes once, keeping only trips that have timepoints
+    trip_info_by_id = relevant_trips_direction.drop_duplicates('trip_id').set_index('trip_id')
+    trips_with_stops = set(trip_stops['trip_id'].unique())
+    trip_ids = [trip_id for trip_id in trip_info_by_id.index if trip_id in trips_with_stops]
+    if not trip_ids:
+        logging.warning("No timepoints found for trips in this direction.")
+        return pd.DataFrame()
+
+    # Convert all departure times at once: display string and seconds since midnight
+    departure_times = convert_departure_times(trip_stops['departure_time'], time_format)
+    valid_times = departure_times['departure_seconds'].notna()
+    # Warn once per trip, listing each (stop_id, departure_time) that could not be parsed
+    invalid_stops = trip_stops[~valid_times]
+    for trip_id, trip_invalid in invalid_stops.groupby('trip_id', sort=False, observed=True):
+        logging.warning(
+            "Invalid time format at %d stop(s) in trip_id '%s': %s",
+            len(trip_invalid), trip_id,
+            list(zip(trip_invalid['stop_id'], trip_invalid['departure_time']))
+        )
 
-    # Build column names
-    columns = (
-        ['Route Name', 'Direction ID', 'Trip Headsign']
-        + [f"{sn} Schedule" for sn in ordered_stop_names]
-        + ['sort_time']
+    trip_stops = trip_stops.join(departure_times)[valid_times]
+    trip_stops['column'] = np.searchsorted(
+        ordered_stop_sequences, trip_stops['stop_sequence'].to_numpy(), side='right'
+    ) - 1
+
+    # Check for sequential times within each trip; warn once per trip
+    trip_groups = trip_stops.groupby('trip_id', sort=False, observed=True)
+    backwards = pd.DataFrame({
+        'trip_id': trip_stops['trip_id'],
+        'position': trip_groups.cumcount()
+    })[trip_groups['departure_seconds'].diff() < 0].drop_duplicates('trip_id')
+    for trip_id, i in zip(backwards['trip_id'], backwards['position']):
+        logging.warning(
+            "⚠️ Non-sequential departure times in trip_id '%s' for Route '%s', Schedule '%s', "
+            "Direction '%s'. Stop %d is earlier than Stop %d.",
+            trip_id, route_short_name, schedule_type, direction_id, i + 1, i
+        )
+
+    # Pivot to one row per trip and one column per stop occurrence, filling the
+    # placeholder where a trip has no time; the last time wins for repeated sequences
+    df = (
+        trip_stops.drop_duplicates(['trip_id', 'column'], keep='last')
+        .pivot(index='trip_id', columns='column', values='departure_time_display')
+        .reindex(index=trip_ids, columns=range(len(ordered_stop_sequences)))
+        .fillna(MISSING_TIME)
     )
-    df = pd.DataFrame(output_data, columns=columns)
+    df.columns = [f"{sn} Schedule" for sn in ordered_stop_names]
+
+    trip_info = trip_info_by_id.loc[trip_ids]
+    df.insert(0, 'Route Name', trip_info['route_id'].map(route_name_map).to_numpy())
+    df.insert(1, 'Direction ID', trip_info['direction_id'].to_numpy())
+    df.insert(2, 'Trip Headsign', trip_info['trip_headsign'].to_numpy()
+              if 'trip_headsign' in trip_info else '')
 
-    # Sort by the 'sort_time' column, then remove it
-    df = df.sort_values(by='sort_time').drop(columns=['sort_time'])
+    # Sort by the maximum departure time; trips with no valid times go to the bottom
+    sort_key = trip_groups['departure_seconds'].max().reindex(trip_ids).fillna(np.inf)
+    df = df.iloc[np.argsort(sort_key.to_numpy(), kind='stable')].reset_index(drop=True)
 
     # Perform schedule order check across rows & columns
     check_schedule_order(df, ordered_stop_names, route_short_name, schedule_type, direction_id)
@@ -401,51 +465,53 @@ def process_trips_for_direction(
     return df
 
 
+def get_column_widths(df):
+    """
+    Returns the Excel width of each column: the longest header or value plus padding,
+    limited to MAX_COLUMN_WIDTH. Lengths are computed per column in vectorized form.
+    """
+    max_lengths = df.astype('string').apply(lambda col: col.str.len().max()).fillna(0)
+    header_lengths = [len(str(col)) for col in df.columns]
+    widths = np.minimum(
+        np.maximum(max_lengths.to_numpy(dtype=int), header_lengths) + 2, MAX_COLUMN_WIDTH
+    )
+    return widths.tolist()
+
+
 def export_to_excel_multiple_sheets(df_dict, output_file):
     """
     Exports multiple DataFrames to an Excel file with each DataFrame in a separate sheet.
+    Rows are streamed to disk using xlsxwriter's constant-memory mode.
     """
     if not df_dict:
         print(f"No data to export to {output_file}.")
         return
 
-    with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-        for sheet_name, df in df_dict.items():
-            if df.empty:
-                print(f"No data for sheet '{sheet_name}'. Skipping...")
-                continue
-            df.to_excel(writer, index=False, sheet_name=sheet_name)
-
-            worksheet = writer.sheets[sheet_name]
-
-            # Apply alignment to headers and adjust column widths
-            for col_num, _ in enumerate(df.columns, 1):
-                # Get the column letter
-                col_letter = get_column_letter(col_num)
-
-                # Set alignment to left and enable text wrapping for the header,
-                # but also align vertically to the top (or center, if you prefer).
-                header_cell = worksheet[f'{col_letter}1']
-                header_cell.alignment = Alignment(horizontal='left', vertical='top', wrap_text=True)
-
-                # Set alignment to left for all data cells in the column
-                for row_num in range(2, worksheet.max_row + 1):
-                    cell = worksheet[f'{col_letter}{row_num}']
-                    cell.alignment = Alignment(horizontal='left')
-
-                # Calculate the maximum width for this column
-                column_cells = worksheet[col_letter]
-                try:
-                    max_length = max(
-                        len(str(cell.value)) for cell in column_cells if cell.value is not None
-                    )
-                except Exception:
-                    max_length = 10  # Default width if calculation fails
-
-                # Adjust the column width, limiting it to the maximum column width
-                adjusted_width = min(max_length + 2, MAX_COLUMN_WIDTH)
-                worksheet.column_dimensions[col_letter].width = adjusted_width
+    workbook = xlsxwriter.Workbook(output_file, {'constant_memory': True, 'strings_to_urls': False})
 
+    # Left-align everything; headers also wrap and align to the top
+    header_format = workbook.add_format(
+        {'bold': True, 'border': 1, 'align': 'left', 'valign': 'top', 'text_wrap': True}
+    )
+    cell_format = workbook.add_format({'align': 'left'})
+
+    for sheet_name, df in df_dict.items():
+        if df.empty:
+            print(f"No data for sheet '{sheet_name}'. Skipping...")
+            continue
+        worksheet = workbook.add_worksheet(sheet_name)
+
+        for col_num, width in enumerate(get_column_widths(df)):
+            worksheet.set_column(col_num, col_num, width, cell_format)
+
+        # Write the header, then stream the rows in order (required by constant-memory mode);
+        # data cells take the left alignment from their column format
+        worksheet.write_row(0, 0, df.columns, header_format)
+        values = df.astype(object).where(df.notna(), None)
+        for row_num, row in enumerate(values.itertuples(index=False), 1):
+            worksheet.write_row(row_num, 0, row)
+
+    workbook.close()
     print(f"Data exported to {output_file}")
 
 
@@ -453,153 +519,265 @@ def export_to_excel_multiple_sheets(df_dict, output_file):
 # MAIN SCRIPT LOGIC
 # ==============================
 
-# Load GTFS files with basic error handling
-try:
-    trips = pd.read_csv(trips_file, dtype=str)
-    stop_times = pd.read_csv(stop_times_file, dtype=str)
-    routes = pd.read_csv(routes_file, dtype=str)
-    stops = pd.read_csv(stops_file, dtype=str)
-    calendar = pd.read_csv(calendar_file, dtype=str)
-    print("Successfully loaded all GTFS files.")
-except FileNotFoundError as e:
-    print(f"Error: {e}")
-    print("Please check your input file paths in the configuration section.")
-    sys.exit(1)
-except Exception as e:
-    print(f"An unexpected error occurred while reading GTFS files: {e}")
-    sys.exit(1)
-
-# Convert 'stop_sequence' to numeric to ensure correct sorting
-stop_times['stop_sequence'] = pd.to_numeric(stop_times['stop_sequence'], errors='coerce')
-if stop_times['stop_sequence'].isnull().any():
-    print("Warning: Some 'stop_sequence' values could not be converted to numeric.")
-
-# Handle 'route_short_names_input' being 'all', a string, or a list
-if isinstance(route_short_names_input, str):
-    if route_short_names_input.lower() == 'all':
-        route_short_names = routes['route_short_name'].dropna().unique().tolist()
-        print(f"Selected all routes: {route_short_names}")
-    else:
-        # Assume comma-separated string
-        route_short_names = [name.strip() for name in route_short_names_input.split(',')]
-        print(f"Selected routes: {route_short_names}")
-elif isinstance(route_short_names_input, list):
-    if 'all' in [name.lower() for name in route_short_names_input]:
-        route_short_names = routes['route_short_name'].dropna().unique().tolist()
-        print(f"Selected all routes: {route_short_names}")
+# Prepared GTFS data used by worker processes, under the 'gtfs_data' key: inherited
+# from the main process when workers are forked, loaded by init_worker() otherwise
+_GTFS_DATA = {}
+
+
+def load_gtfs_data(verbose=True):
+    """
+    Loads and prepares the GTFS tables, returning them in a SimpleNamespace with
+    the trips, routes and timepoints tables, the row lookups trips_by_route_schedule
+    and trip_rows, and the route_name_map, stop_name_map and service_id_schedule_map
+    dictionaries. Informational messages are printed only when 'verbose' is True.
+    """
+    # Load GTFS files with basic error handling
+    try:
+        trips = read_gtfs_csv(trips_file, TRIPS_COLUMNS)
+        # Only timepoint rows are used, so drop the rest while streaming the file
+        stop_times = read_gtfs_csv(
+            stop_times_file, STOP_TIMES_COLUMNS, keep_rows=('timepoint', '1')
+        )
+        routes = read_gtfs_csv(routes_file, ROUTES_COLUMNS)
+        stops = read_gtfs_csv(stops_file, STOPS_COLUMNS)
+        calendar = read_gtfs_csv(calendar_file, CALENDAR_COLUMNS)
+        if verbose:
+            print("Successfully loaded all GTFS files.")
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        print("Please check your input file paths in the configuration section.")
+        sys.exit(1)
+    except Exception as e:
+        print(f"An unexpected error occurred while reading GTFS files: {e}")
+        sys.exit(1)
+
+    # Encode ID columns as categoricals so that filters, joins and groupbys compare
+    # integer codes; files sharing an ID column share one dictionary of categories
+    for id_column, gtfs_tables in {
+        'trip_id': (trips, stop_times),
+        'stop_id': (stop_times, stops),
+        'route_id': (trips, routes),
+        'service_id': (trips, calendar),
+    }.items():
+        id_dtype = shared_category_dtype(*(table[id_column] for table in gtfs_tables))
+        for table in gtfs_tables:
+            table[id_column] = table[id_column].astype(id_dtype)
+    trips['direction_id'] = trips['direction_id'].astype('category')
+    gtfs_data = SimpleNamespace(trips=trips, routes=routes)
+
+    # Mapping service_id to schedule types: pack each calendar row's service days
+    # into a 7-bit code and look up its schedule type in one vectorized pass
+    service_day_mask = calendar.reindex(columns=list(DAYS), fill_value='0').eq('1').to_numpy()
+    service_day_codes = service_day_mask @ (1 << np.arange(len(DAYS)))
+    calendar['schedule_type'] = build_schedule_type_lookup()[service_day_codes]
+
+    gtfs_data.service_id_schedule_map = dict(
+        zip(calendar['service_id'], calendar['schedule_type'])
+    )
+
+    # Row positions of trips per (route_id, schedule_type), so each route/schedule
+    # pair selects its trips with a dict lookup instead of rescanning the table;
+    # trips whose service_id is not in calendar.txt belong to no schedule
+    trips['schedule_type'] = trips['service_id'].map(gtfs_data.service_id_schedule_map)
+    gtfs_data.trips_by_route_schedule = trips.groupby(
+        ['route_id', 'schedule_type'], sort=False, observed=True
+    ).indices
+
+    # Lookup tables for names used while building each schedule
+    gtfs_data.route_name_map = routes.set_index('route_id')['route_short_name'].to_dict()
+    gtfs_data.stop_name_map = stops.set_index('stop_id')['stop_name'].to_dict()
+
+    # Strip stray whitespace from departure times once, rather than on every conversion
+    stop_times['departure_time'] = stop_times['departure_time'].str.strip()
+
+    # Convert 'stop_sequence' to numeric to ensure correct sorting
+    stop_times['stop_sequence'] = pd.to_numeric(stop_times['stop_sequence'], errors='coerce')
+    if verbose and stop_times['stop_sequence'].isnull().any():
+        logging.warning("Some 'stop_sequence' values could not be converted to numeric.")
+
+    # Check for 'timepoint' column; its rows were already filtered while reading
+    if 'timepoint' in stop_times.columns:
+        timepoints = stop_times
+        if verbose:
+            print("Filtered stop_times based on 'timepoint' column.")
     else:
-        route_short_names = route_short_names_input
-        print(f"Selected routes: {route_short_names}")
-else:
-    print("Error: 'route_short_names_input' must be either 'all', a comma-separated string, "
-          "or a list of route short names.")
-    sys.exit(1)
-
-# Check for 'timepoint' column and filter timepoints
-if 'timepoint' in stop_times.columns:
-    timepoints = stop_times[stop_times['timepoint'] == '1']
-    print("Filtered stop_times based on 'timepoint' column.")
-else:
-    print("Warning: 'timepoint' column not found. Using all stops as timepoints.")
-    timepoints = stop_times.copy()
-
-# Mapping service_id to schedule types
-service_id_schedule_map = {}
-schedule_types_set = set()
-
-for _, service_row in calendar.iterrows():
-    service_id = service_row['service_id']
-    stype = map_service_id_to_schedule(service_row)
-    service_id_schedule_map[service_id] = stype
-    schedule_types_set.add(stype)
-
-print(f"Identified schedule types: {schedule_types_set}")
-
-# Process each route and schedule_type
-for route_short_name in route_short_names:
-    print(f"\nProcessing route '{route_short_name}'...")
-
-    # Get route_ids for the current route_short_name
-    route_ids = routes[routes['route_short_name'] == route_short_name]['route_id']
-    if route_ids.empty:
-        print(f"Error: Route '{route_short_name}' not found in routes.txt.")
-        continue  # Skip to next route
-
-    # Process each schedule_type
-    for schedule_type in schedule_types_set:
-        print(f"  Processing schedule type '{schedule_type}'...")
-
-        # Get service_ids for this schedule_type
-        relevant_service_ids = [
-            sid for sid, stype_ in service_id_schedule_map.items() if stype_ == schedule_type
-        ]
-
-        if not relevant_service_ids:
-            print(f"    No services found for schedule type '{schedule_type}'.")
+        if verbose:
+            logging.warning("'timepoint' column not found. Using all stops as timepoints.")
+        timepoints = stop_times.copy()
+
+    # Sort timepoints once; trip_id is categorical, so later .isin() filters
+    # compare integer codes instead of hashing strings
+    gtfs_data.timepoints = timepoints.sort_values(['trip_id', 'stop_sequence'])
+
+    # Locate each trip's rows once, rather than re-filtering for every direction
+    gtfs_data.trip_rows = gtfs_data.timepoints.groupby(
+        'trip_id', sort=False, observed=True
+    ).indices
+
+    return gtfs_data
+
+
+def init_worker():
+    """
+    Worker process initializer for workers that are not forked: each worker reads
+    the GTFS files itself rather than receiving pickled DataFrames.
+    """
+    _GTFS_DATA['gtfs_data'] = load_gtfs_data(verbose=False)
+
+
+def process_route_schedule(gtfs_data, route_short_name, route_ids, schedule_type):
+    """
+    Builds the schedule for one route and schedule type from the prepared
+    'gtfs_data' and exports it to Excel, with one sheet per direction_id. Runs
+    independently of other route/schedule pairs, so it can be executed in a
+    worker process.
+    """
+    print(f"Processing route '{route_short_name}', schedule type '{schedule_type}'...")
+
+    # Get trips for this route and schedule_type, in trips.txt order
+    relevant_trips = gtfs_data.trips.iloc[np.sort(gather_rows(
+        gtfs_data.trips_by_route_schedule,
+        [(route_id, schedule_type) for route_id in route_ids]
+    ))]
+
+    if relevant_trips.empty:
+        print(f"    No trips found for route '{route_short_name}' "
+              f"with schedule type '{schedule_type}'.")
+        return
+
+    # Split these trips by direction_id in a single pass
+    trips_by_direction = dict(
+        list(relevant_trips.groupby('direction_id', sort=False, observed=True))
+    )
+
+    # Dictionary to hold DataFrames for each direction_id
+    df_sheets = {}
+
+    for direction_id, trips_direction in trips_by_direction.items():
+        print(f"    Processing direction_id '{direction_id}'...")
+
+        # Gather this direction's timepoints once, in timepoints order, for both steps below
+        trip_rows_in_direction = gather_rows(
+            gtfs_data.trip_rows, trips_direction['trip_id'].unique()
+        )
+        trip_stops = gtfs_data.timepoints.iloc[np.sort(trip_rows_in_direction)]
+
+        # Get ordered stops for this direction_id
+        ordered_stop_names, ordered_stop_ids = get_ordered_stops(
+            direction_id, trip_stops, gtfs_data.stop_name_map
+        )
+
+        if not ordered_stop_names:
+            print(f"      No stops found for direction_id '{direction_id}'. Skipping...")
             continue
 
-        # Get trips for this route and schedule_type
-        relevant_trips = trips[
-            (trips['route_id'].isin(route_ids)) &
-            (trips['service_id'].isin(relevant_service_ids))
-        ]
+        # Process trips for this direction_id
+        df = process_trips_for_direction(
+            trips_direction,
+            trip_stops,
+            ordered_stop_names,
+            ordered_stop_ids,
+            TIME_FORMAT_OPTION,
+            route_short_name,
+            schedule_type,
+            direction_id,
+            gtfs_data.route_name_map
+        )
 
-        if relevant_trips.empty:
-            print(f"    No trips found for route '{route_short_name}' "
-                  f"with schedule type '{schedule_type}'.")
+        if df.empty:
+            print(f"      No data to export for direction_id '{direction_id}'.")
             continue
 
-        # Get unique direction_ids within these trips
-        direction_ids = relevant_trips['direction_id'].unique()
+        # Add DataFrame to the sheets dictionary with sheet name as 'Direction_{direction_id}'
+        sheet_name_var = f"Direction_{direction_id}"  # Renamed to avoid "constant" naming error
+        df_sheets[sheet_name_var] = df
 
-        # Dictionary to hold DataFrames for each direction_id
-        df_sheets = {}
+    if not df_sheets:
+        print(f"    No data to export for route '{route_short_name}' "
+              f"with schedule '{schedule_type}'.")
+        return
 
-        for direction_id in direction_ids:
-            print(f"    Processing direction_id '{direction_id}'...")
+    # Sanitize schedule_type for filename
+    schedule_type_safe = schedule_type.replace(' ', '_').replace('-', '_').replace('/', '_')
 
-            # Get trips for this direction_id
-            trips_direction = relevant_trips[relevant_trips['direction_id'] == direction_id]
+    # Define output file path
+    output_file = os.path.join(
+        BASE_OUTPUT_PATH,
+        f"route_{route_short_name}_schedule_{schedule_type_safe}.xlsx"
+    )
 
-            # Get ordered stops for this direction_id
-            ordered_stop_names, ordered_stop_ids = get_ordered_stops(direction_id, trips_direction)
+    # Export to Excel with multiple sheets
+    export_to_excel_multiple_sheets(df_sheets, output_file)
 
-            if not ordered_stop_names:
-                print(f"      No stops found for direction_id '{direction_id}'. Skipping...")
-                continue
 
-            # Process trips for this direction_id
-            df = process_trips_for_direction(
-                trips_direction,
-                ordered_stop_names,
-                ordered_stop_ids,
-                TIME_FORMAT_OPTION,
-                route_short_name,
-                schedule_type,
-                direction_id
-            )
-
-            if df.empty:
-                print(f"      No data to export for direction_id '{direction_id}'.")
-                continue
+def process_route_schedule_in_worker(route_short_name, route_ids, schedule_type):
+    """
+    Runs process_route_schedule in a worker process on the GTFS data held in _GTFS_DATA.
+    """
+    process_route_schedule(_GTFS_DATA['gtfs_data'], route_short_name, route_ids, schedule_type)
 
-            # Add DataFrame to the sheets dictionary with sheet name as 'Direction_{direction_id}'
-            sheet_name_var = f"Direction_{direction_id}"  # Renamed to avoid "constant" naming error
-            df_sheets[sheet_name_var] = df
 
-        if not df_sheets:
-            print(f"    No data to export for route '{route_short_name}' "
-                  f"with schedule '{schedule_type}'.")
-            continue
+def main():
+    """
+    Loads the GTFS data, resolves the selected routes, and exports a workbook for
+    each route and schedule type, in parallel across MAX_WORKERS processes
+    (see its configuration note on memory use when workers are not forked).
+    """
+    gtfs_data = load_gtfs_data()
+    routes = gtfs_data.routes
+
+    # Handle 'route_short_names_input' being 'all', a string, or a list
+    if isinstance(route_short_names_input, str):
+        if route_short_names_input.lower() == 'all':
+            route_short_names = routes['route_short_name'].dropna().unique().tolist()
+            print(f"Selected all routes: {route_short_names}")
+        else:
+            # Assume comma-separated string
+            route_short_names = [name.strip() for name in route_short_names_input.split(',')]
+            print(f"Selected routes: {route_short_names}")
+    elif isinstance(route_short_names_input, list):
+        if 'all' in [name.lower() for name in route_short_names_input]:
+            route_short_names = routes['route_short_name'].dropna().unique().tolist()
+            print(f"Selected all routes: {route_short_names}")
+        else:
+            route_short_names = route_short_names_input
+            print(f"Selected routes: {route_short_names}")
+    else:
+        print("Error: 'route_short_names_input' must be either 'all', a comma-separated string, "
+              "or a list of route short names.")
+        sys.exit(1)
+
+    schedule_types_set = set(gtfs_data.service_id_schedule_map.values())
+    print(f"Identified schedule types: {schedule_types_set}")
+
+    # One independent task per route and schedule_type
+    tasks = []
+    for route_short_name in route_short_names:
+        # Get route_ids for the current route_short_name
+        route_ids = routes.loc[routes['route_short_name'] == route_short_name, 'route_id'].tolist()
+        if not route_ids:
+            print(f"Error: Route '{route_short_name}' not found in routes.txt.")
+            continue  # Skip to next route
+        tasks.extend((route_short_name, route_ids, stype) for stype in schedule_types_set)
+
+    # Forked workers inherit the loaded data; spawned workers (e.g. on Windows) load it themselves
+    is_forking = multiprocessing.get_start_method() == 'fork'
+    max_workers = MAX_WORKERS
+    if max_workers is None:
+        max_workers = os.cpu_count() if is_forking else 1
+
+    if max_workers == 1 or len(tasks) <= 1:
+        for task in tasks:
+            process_route_schedule(gtfs_data, *task)
+        return
 
-        # Sanitize schedule_type for filename
-        schedule_type_safe = schedule_type.replace(' ', '_').replace('-', '_').replace('/', '_')
+    # Forked workers inherit this slot; the others fill it in init_worker()
+    _GTFS_DATA['gtfs_data'] = gtfs_data
+    with ProcessPoolExecutor(
+        max_workers=max_workers, initializer=None if is_forking else init_worker
+    ) as executor:
+        list(executor.map(process_route_schedule_in_worker, *zip(*tasks)))
 
-        # Define output file path
-        output_file = os.path.join(
-            BASE_OUTPUT_PATH,
-            f"route_{route_short_name}_schedule_{schedule_type_safe}.xlsx"
-        )
 
-        # Export to Excel with multiple sheets
-        export_to_excel_multiple_sheets(df_sheets, output_file)
+if __name__ == "__main__":
+    main()
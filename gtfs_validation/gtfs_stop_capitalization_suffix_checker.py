@@ -9,9 +9,18 @@ Description: Provides functionality to validate stop names in GTFS data for:
 """
 
 import os
+import re
 
+import numpy as np
 import pandas as pd
 
+# Use Arrow-backed string columns when PyArrow is installed
+try:
+    import pyarrow  # pylint: disable=unused-import
+    ID_DTYPE = 'string[pyarrow]'
+except ImportError:  # Fall back to plain Python strings
+    ID_DTYPE = 'object'
+
 # ================================
 # CONFIGURATION SECTION
 # ================================
@@ -27,7 +36,7 @@ EXEMPT_WORDS = [
     "AND", "VAN", "LA", "OX", "OLD", "BAY", "FOX", "LEE", "OAK", "ELM",
     "GUM", "MAR", "THE", "RED", "OWL", "NEW"
 ]
-EXEMPT_WORDS_SET = {word.upper() for word in EXEMPT_WORDS}
+EXEMPT_WORDS_SET = frozenset(word.upper() for word in EXEMPT_WORDS)
 
 # Approved USPS abbreviations
 USPS_ABBREVIATIONS = [
@@ -52,112 +61,117 @@ USPS_ABBREVIATIONS = [
     "WAYS", "WL", "WLS"
 ]
 
-USPS_ABBREVIATIONS_SET = {abbr.upper().strip() for abbr in USPS_ABBREVIATIONS}
+USPS_ABBREVIATIONS_SET = frozenset(abbr.upper().strip() for abbr in USPS_ABBREVIATIONS)
 
 # Combined valid short words (USPS suffixes + exempt words)
-VALID_SHORT_WORDS_SET = USPS_ABBREVIATIONS_SET.union(EXEMPT_WORDS_SET)
+VALID_SHORT_WORDS_SET = USPS_ABBREVIATIONS_SET | EXEMPT_WORDS_SET
 
 # ================================
 # END CONFIGURATION SECTION
 # ================================
 
-def check_capitalization(stop_name):
+CAPITALIZATION_SCHEMES = [
+    'ALL_LOWERCASE', 'ALL_UPPERCASE', 'PROPER_TITLE_CASE',
+    'FIRST_LETTER_CAPITALIZED', 'MIXED_CASE'
+]
+
+# Small words kept lowercase in proper title case, matched as whole words after the first
+TITLE_CASE_EXCEPTIONS_RE = re.compile(
+    r'(?<= )(And|Or|The|In|At|By|To|For|Of|On|As|A|An|But)(?= |$)'
+)
+
+def classify_capitalization(stop_names):
     """
-    Check the capitalization scheme of the stop name.
-    Returns one of:
+    Classify the capitalization scheme of every stop name in one vectorized pass.
+    Returns a categorical Series holding one of the following for each name:
         - 'ALL_LOWERCASE'
         - 'ALL_UPPERCASE'
         - 'PROPER_TITLE_CASE'
         - 'FIRST_LETTER_CAPITALIZED'
         - 'MIXED_CASE'
     """
-    stop_name_lower = stop_name.lower()
-    stop_name_upper = stop_name.upper()
-
-    # Check for all lowercase
-    if stop_name == stop_name_lower:
-        return 'ALL_LOWERCASE'
-
-    # Check for all uppercase
-    if stop_name == stop_name_upper:
-        return 'ALL_UPPERCASE'
-
-    # Check for proper title case with exceptions for small words
-    exceptions = {"and", "or", "the", "in", "at", "by", "to", "for", "of", "on", "as", "a", "an", "but"}
-    title_case_words = stop_name.title().split()
-    for i in range(1, len(title_case_words)):
-        if title_case_words[i].lower() in exceptions:
-            title_case_words[i] = title_case_words[i].lower()
-
-    title_case_normalized = " ".join(title_case_words)
-    if stop_name == title_case_normalized:
-        return 'PROPER_TITLE_CASE'
-
-    # Check for first letter capitalization
-    if stop_name and stop_name[0].isupper() and stop_name[1:].islower():
-        return 'FIRST_LETTER_CAPITALIZED'
-
-    # Otherwise, it's mixed case
-    return 'MIXED_CASE'
-
-
-def check_usps_suffix(stop_name):
+    is_lowercase = stop_names.eq(stop_names.str.lower())
+    is_uppercase = stop_names.eq(stop_names.str.upper())
+
+    # Only names in neither single case need the title-case and first-letter checks
+    mixed_names = stop_names[~(is_lowercase | is_uppercase)]
+
+    # Proper title case, with small words after the first word kept lowercase
+    title_case_normalized = (
+        mixed_names.str.title()
+        .str.split()
+        .str.join(' ')
+        .str.replace(TITLE_CASE_EXCEPTIONS_RE, lambda match: match.group(1).lower(), regex=True)
+    )
+    is_title_case = mixed_names.eq(title_case_normalized)
+    is_first_letter_capitalized = (
+        mixed_names.str[:1].str.isupper() & mixed_names.str[1:].str.islower()
+    )
+
+    conditions = [
+        is_lowercase,
+        is_uppercase,
+        is_title_case.reindex(stop_names.index, fill_value=False),
+        is_first_letter_capitalized.reindex(stop_names.index, fill_value=False),
+    ]
+    scheme_codes = np.select(conditions, range(len(conditions)), default=len(conditions))
+    schemes = pd.Categorical.from_codes(scheme_codes, categories=CAPITALIZATION_SCHEMES)
+    return pd.Series(schemes, index=stop_names.index)
+
+
+def find_suffix_errors(stop_name_parts):
     """
-    Check if the stop name ends with a valid USPS suffix, only if the suffix is a short word.
-    Returns a tuple (bool, message).
+    Check if each stop name ends with a valid USPS suffix, only if the suffix is a short word.
+    Takes the whitespace-split stop names and returns a Series holding the error
+    message for each failing stop, indexed like the input.
     """
-    stop_name_parts = stop_name.split()
-    if not stop_name_parts:
-        return False, "Empty stop name"
+    last_parts = stop_name_parts.str[-1]
+    is_empty = last_parts.isna()
 
-    last_part = stop_name_parts[-1].upper()
-    if len(last_part) in [2, 3]:  # Only consider short words
-        if last_part not in USPS_ABBREVIATIONS_SET:
-            return False, f"Invalid suffix: {last_part}"
+    # Only consider short words; uppercase just those before the membership test
+    short_suffixes = last_parts[last_parts.str.len().isin([2, 3])].str.upper()
+    invalid_suffixes = short_suffixes[~short_suffixes.isin(USPS_ABBREVIATIONS_SET)]
 
-    return True, ""
+    suffix_errors = 'Invalid suffix: ' + invalid_suffixes
+    empty_errors = pd.Series("Empty stop name", index=last_parts.index[is_empty])
+    return pd.concat([suffix_errors, empty_errors]).sort_index(kind='mergesort')
 
 
-def find_invalid_short_words(stop_name):
+def find_invalid_short_words(stop_name_parts):
     """
-    Find two or three-letter words in the stop name not in USPS abbreviations or exempt words.
-    Returns a list of invalid short words.
+    Find two or three-letter words in the stop names not in USPS abbreviations or exempt words.
+    Takes the whitespace-split stop names and returns a Series holding the comma-separated
+    invalid short words for each failing stop, indexed like the input.
     """
-    words = stop_name.split()
-    short_words = [word.upper() for word in words if len(word) in [2, 3]]
-    invalid_words = [word for word in short_words if word not in VALID_SHORT_WORDS_SET]
-    return invalid_words
+    words = stop_name_parts.explode()
+    short_words = words[words.str.len().isin([2, 3])].str.upper()
+    invalid_words = short_words[~short_words.isin(VALID_SHORT_WORDS_SET)]
+    return invalid_words.groupby(level=0, sort=True).agg(', '.join)
 
 
-def validate_stop(stop_row):
+def validate_stop_names(stops_df):
     """
-    Validate a single stop row.
-    Returns a dictionary with potential errors and the capitalization scheme.
+    Validate all stops in one columnar pass, checking each distinct name only once.
+    Returns the stops with their capitalization scheme and a DataFrame of the
+    suffix and short-word errors found, one row per error.
     """
-    stop_id = stop_row['stop_id']
-    stop_name = stop_row['stop_name'].strip()
+    results = stops_df[['stop_id']].astype(ID_DTYPE)
+    results['stop_name'] = stops_df['stop_name'].fillna('').str.strip()
+    name_codes, unique_names = pd.factorize(results['stop_name'])
+    unique_names = pd.Series(unique_names)
+    results['capitalization_scheme'] = classify_capitalization(unique_names).array.take(name_codes)
 
-    # Check capitalization
-    capitalization_scheme = check_capitalization(stop_name)
+    stop_name_parts = unique_names.str.split()
+    suffix_errors = find_suffix_errors(stop_name_parts)
+    short_word_errors = 'Invalid short words: ' + find_invalid_short_words(stop_name_parts)
 
-    # Check USPS suffix
-    is_suffix_valid, suffix_message = check_usps_suffix(stop_name)
-
-    # Check invalid short words
-    invalid_short_words = find_invalid_short_words(stop_name)
-
-    errors = []
-    if not is_suffix_valid:
-        errors.append(suffix_message)
-    if invalid_short_words:
-        errors.append(f"Invalid short words: {', '.join(invalid_short_words)}")
-
-    return {
-        'stop_id': stop_id,
-        'stop_name': stop_name,
-        'capitalization_scheme': capitalization_scheme,
-        'errors': errors
-    }
+    # Keep each stop's suffix error ahead of its short-word error;
+    # a left merge keeps the stops' order, which an inner merge would not
+    name_errors = pd.concat([suffix_errors, short_word_errors]).sort_index(kind='mergesort')
+    errors_df = results[['stop_id', 'stop_name']].assign(name_code=name_codes).merge(
+        name_errors.rename('error'), how='left', left_on='name_code', right_index=True
+    ).dropna(subset=['error'])[['stop_id', 'stop_name', 'error']]
+    return results, errors_df
 
 
 def main():
@@ -173,7 +187,11 @@ def main():
         os.makedirs(output_folder_path)
 
     # Load stops data
-    stops_df = pd.read_csv(input_file_path, dtype=str)
+    stops_df = pd.read_csv(
+        input_file_path,
+        dtype=str,
+        usecols=lambda col: col in ('stop_id', 'stop_name')
+    )
 
     # Ensure required columns exist
     required_columns_stops = ['stop_id', 'stop_name']
@@ -181,34 +199,22 @@ def main():
     if missing_columns:
         raise ValueError(f"Missing required columns in stops.txt: {', '.join(missing_columns)}")
 
-    # Validate each stop
-    results = stops_df.apply(validate_stop, axis=1, result_type='expand')
+    # Classify capitalization and collect suffix/short-word errors
+    results, errors_df = validate_stop_names(stops_df)
 
-    # Aggregate capitalization schemes
-    scheme_counts = results['capitalization_scheme'].value_counts()
+    # Aggregate capitalization schemes by counting their category codes
+    scheme_counts = np.bincount(
+        results['capitalization_scheme'].cat.codes, minlength=len(CAPITALIZATION_SCHEMES)
+    )
     total_stops = len(results)
 
     # Print the percentages for each scheme
-    for scheme in ['ALL_LOWERCASE', 'ALL_UPPERCASE', 'PROPER_TITLE_CASE',
-                   'FIRST_LETTER_CAPITALIZED', 'MIXED_CASE']:
-        count = scheme_counts.get(scheme, 0)
+    for scheme, count in zip(CAPITALIZATION_SCHEMES, scheme_counts):
         percent = (count / total_stops) * 100
         print(f"Percent of stops with {scheme}: {percent:.2f}%")
 
-    # Separate out errors
-    all_errors = []
-    for idx, row in results.iterrows():
-        if row['errors']:
-            for err in row['errors']:
-                all_errors.append({
-                    'stop_id': row['stop_id'],
-                    'stop_name': row['stop_name'],
-                    'error': err
-                })
-
     # Save errors to CSV if any
-    if all_errors:
-        errors_df = pd.DataFrame(all_errors)
+    if not errors_df.empty:
         errors_df.to_csv(output_file_path, index=False)
         print(f"Errors found. Report saved to {output_file_path}")
     else:
@@ -3,7 +3,7 @@
 """
 Module: gtfs_stop_road_shp_typo_finder
 Description: Identifies potential typos in GTFS stop names by comparing them
-to roadway shapefile names using fuzzy matching.
+to the names of nearby roadways in a shapefile using fuzzy matching.
 """
 
 import os
@@ -11,9 +11,25 @@ import re
 import logging
 
 import geopandas as gpd
+import numpy as np
 import pandas as pd
 from rapidfuzz import fuzz, process
 from pyproj import CRS
+import shapely
+from shapely.strtree import STRtree
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+except ImportError:  # Fall back to the pandas C parser
+    pa = None
+    pa_csv = None
+
+try:
+    import pyogrio  # pylint: disable=unused-import
+    GEO_IO_ENGINE = 'pyogrio'
+except ImportError:  # Fall back to geopandas' default Fiona engine
+    GEO_IO_ENGINE = None
 
 # ==============================
 # CONFIGURATION SECTION - CUSTOMIZE HERE
@@ -37,6 +53,7 @@ TARGET_CRS = 'EPSG:2248' # Projected CRS for spatial analysis (adjust as needed)
 
 # Processing parameters
 SIMILARITY_THRESHOLD = 80  # 0-100, higher number yields fewer results
+FUZZY_MATCH_WORKERS = -1   # Threads used for fuzzy scoring; -1 uses all CPU cores
 
 # Buffer distance configuration
 BUFFER_DISTANCE_VALUE = 50
@@ -140,10 +157,34 @@ if not os.path.isfile(STOPS_PATH):
         "'stops.txt' not found in the GTFS folder: %s" % GTFS_FOLDER
     )
 
-STOPS_DF = pd.read_csv(STOPS_PATH, dtype=str)  # Read all columns as strings
-
 REQUIRED_COLUMNS_STOPS = ['stop_id', 'stop_name', 'stop_lat', 'stop_lon']
 
+# Read only the required columns, with IDs and names as strings and coordinates parsed
+# straight to floats; PyArrow's multi-threaded reader is used when installed
+STOPS_COLUMNS = [
+    col for col in pd.read_csv(STOPS_PATH, nrows=0).columns if col in REQUIRED_COLUMNS_STOPS
+]
+STOPS_COORDINATE_COLUMNS = ['stop_lat', 'stop_lon']
+if pa_csv is None:
+    STOPS_DF = pd.read_csv(
+        STOPS_PATH,
+        usecols=STOPS_COLUMNS,
+        dtype={col: float if col in STOPS_COORDINATE_COLUMNS else str for col in STOPS_COLUMNS},
+        float_precision='round_trip'
+    )
+else:
+    STOPS_DF = pa_csv.read_csv(
+        STOPS_PATH,
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=STOPS_COLUMNS,
+            column_types={
+                col: pa.float64() if col in STOPS_COORDINATE_COLUMNS else pa.string()
+                for col in STOPS_COLUMNS
+            },
+            strings_can_be_null=True
+        )
+    ).to_pandas()
+
 MISSING_COLS_STOPS = [
     col for col in REQUIRED_COLUMNS_STOPS if col not in STOPS_DF.columns
 ]
@@ -153,8 +194,14 @@ if MISSING_COLS_STOPS:
         MISSING_COLS_STOPS
     )
 
-STOPS_DF['stop_lat'] = STOPS_DF['stop_lat'].astype(float)
-STOPS_DF['stop_lon'] = STOPS_DF['stop_lon'].astype(float)
+# Stops without coordinates (e.g. generic nodes) cannot be matched to nearby roadways
+MISSING_COORDS_STOPS = STOPS_DF[STOPS_COORDINATE_COLUMNS].isna().any(axis=1).to_numpy()
+if MISSING_COORDS_STOPS.any():
+    logging.warning(
+        "Skipping %d stops without coordinates in stops.txt.",
+        MISSING_COORDS_STOPS.sum()
+    )
+    STOPS_DF = STOPS_DF[~MISSING_COORDS_STOPS].reset_index(drop=True)
 
 stops_gdf = gpd.GeoDataFrame(
     STOPS_DF,
@@ -162,7 +209,7 @@ stops_gdf = gpd.GeoDataFrame(
     crs=STOPS_CRS
 )
 
-roadways_gdf = gpd.read_file(ROADWAYS_PATH)
+roadways_gdf = gpd.read_file(ROADWAYS_PATH, engine=GEO_IO_ENGINE)
 
 stops_gdf = stops_gdf.to_crs(TARGET_CRS)
 roadways_gdf = roadways_gdf.to_crs(TARGET_CRS)
@@ -221,99 +268,168 @@ modifiers = set(
 )
 logging.info("Extracted Modifiers (%d): %s", len(modifiers), modifiers)
 
-def normalize_street_name(name, modifiers_set):
+# Normalization and separator patterns, compiled once rather than on every call
+MODIFIERS_RE = re.compile(
+    r'\b(' + '|'.join(re.escape(m) for m in modifiers) + r')\b', re.IGNORECASE
+) if modifiers else None
+PUNCTUATION_RE = re.compile(r'[^\w\s]')
+WHITESPACE_RE = re.compile(r'\s+')
+SEPARATORS_RE = re.compile(
+    '|'.join(map(re.escape, [' @ ', ' and ', ' & ', '/', ' intersection of '])),
+    re.IGNORECASE
+)
+
+def normalize_street_name(name, modifiers_re):
     """
     Normalize street name by removing known modifiers, punctuation, and extra spaces.
     """
     if pd.isnull(name) or not isinstance(name, str):
         return ''
-    if modifiers_set:
-        pattern = r'\b(' + '|'.join(re.escape(m) for m in modifiers_set) + r')\b'
-        name = re.sub(pattern, '', name, flags=re.IGNORECASE)
-    name = re.sub(r'[^\w\s]', '', name)
-    return re.sub(r'\s+', ' ', name).strip().lower()
-
-roadways_gdf['FULLNAME_clean'] = roadways_gdf['FULLNAME'].apply(
-    lambda x: normalize_street_name(x, modifiers)
-)
+    if modifiers_re is not None:
+        name = modifiers_re.sub('', name)
+    name = PUNCTUATION_RE.sub('', name)
+    return WHITESPACE_RE.sub(' ', name).strip().lower()
 
-stops_gdf['buffered_geometry'] = stops_gdf.geometry.buffer(BUFFER_DISTANCE)
-stops_buffered_gdf = stops_gdf.set_geometry('buffered_geometry')
+def normalize_unique(names):
+    """
+    Normalize a Series of street names, running normalize_street_name only once
+    per distinct name and mapping the results back onto every row.
+    """
+    normalized = {
+        name: normalize_street_name(name, MODIFIERS_RE) for name in names.dropna().unique()
+    }
+    return names.map(normalized).fillna('')
 
-joined_gdf = gpd.sjoin(
-    stops_buffered_gdf[['stop_id', 'stop_name', 'buffered_geometry']],
-    roadways_gdf[['FULLNAME', 'FULLNAME_clean', 'geometry']],
-    how='left',
+# Store cleaned names as categoricals so joins and deduplication compare integer codes
+roadways_gdf['FULLNAME_clean'] = normalize_unique(roadways_gdf['FULLNAME']).astype('category')
+
+# Pair each buffered stop with the roadways it intersects, as row positions; the
+# buffers are built straight from the geometry array (quad_segs=16 matches GeoSeries.buffer).
+# Stops often share a location, so each distinct location is buffered and queried once
+stop_points = stops_gdf.geometry.to_numpy()
+_, location_idx, stop_location = np.unique(
+    shapely.to_wkb(stop_points), return_index=True, return_inverse=True
+)
+roadways_tree = STRtree(roadways_gdf.geometry.to_numpy())
+nearby_location_idx, nearby_road_idx = roadways_tree.query(
+    shapely.buffer(stop_points[location_idx], BUFFER_DISTANCE, quad_segs=16),
     predicate='intersects'
 )
+if len(location_idx) < len(stop_points):
+    # Fan each location's roadways back out to every stop at that location
+    nearby_pairs = pd.DataFrame({
+        'location': stop_location, 'stop': np.arange(len(stop_points))
+    }).merge(
+        pd.DataFrame({'location': nearby_location_idx, 'road': nearby_road_idx}),
+        on='location'
+    )
+    nearby_stop_idx = nearby_pairs['stop'].to_numpy()
+    nearby_road_idx = nearby_pairs['road'].to_numpy()
+else:
+    nearby_stop_idx = location_idx[nearby_location_idx]
 
+# Stops without any nearby roadway still count once, as in a left join
+stops_without_roads = len(stops_gdf) - len(np.unique(nearby_stop_idx))
 logging.info("Total stops processed: %d", len(stops_gdf))
-logging.info("Total spatial join matches: %d", joined_gdf.shape[0])
+logging.info("Total spatial join matches: %d", len(nearby_stop_idx) + stops_without_roads)
 
-def extract_street_names(stop_name):
+def extract_street_names(stop_names):
     """
-    Extract potential street names from a stop name using common separators.
+    Extract potential street names from stop names using common separators.
+    Returns a Series of normalized streets, one row per street, indexed by the
+    row label of the stop it came from.
     """
-    if pd.isnull(stop_name) or not isinstance(stop_name, str):
-        return []
-    separators = [' @ ', ' and ', ' & ', '/', ' intersection of ']
-    pattern = '|'.join(map(re.escape, separators))
-    streets = re.split(pattern, stop_name, flags=re.IGNORECASE)
-    return [
-        normalize_street_name(street, modifiers) for street in streets if street
-    ]
+    streets = stop_names.str.split(SEPARATORS_RE, regex=True).explode()
+    streets = streets[streets.notna() & streets.ne('')]
+    return normalize_unique(streets)
 
 road_names_clean = set(roadways_gdf['FULLNAME_clean'].dropna().unique())
 
-def compare_stop_to_roads(stop_id, stop_name, stop_streets,
-                          road_names, roads_gdf, threshold):
+# Original FULLNAME spellings behind each normalized road name
+clean_to_originals = roadways_gdf.groupby(
+    'FULLNAME_clean', sort=False, observed=True
+)['FULLNAME'].unique().to_dict()
+
+def find_nearby_typos(stop_streets, nearby_roads, road_names, threshold):
     """
-    Compare each portion of the stop name to known road names via fuzzy matching.
+    Fuzzy-match each stop's streets against the roads near that stop only.
+    Both DataFrames are keyed by 'stop' (row position): `stop_streets` holds
+    'street' and 'street_order', `nearby_roads` holds 'road_name_clean' and
+    'road_order'. Each distinct (street, road) pair is scored once with
+    rapidfuzz.process.cpdist. Returns the best three matches per stop street
+    that score at least `threshold` but below 100.
     """
-    potential_typos_list = []
-    for street in stop_streets:
-        if street in road_names:
-            continue
-        match_tuples = process.extract(
-            street, road_names, scorer=fuzz.token_set_ratio, limit=3
+    # Streets that exactly match a known road are not typos
+    candidates = stop_streets[~stop_streets['street'].isin(road_names)].merge(
+        nearby_roads, on='stop'
+    )
+    pairs = candidates[['street', 'road_name_clean']].drop_duplicates()
+    scores = np.empty(0)
+    if not pairs.empty:
+        scores = process.cpdist(
+            pairs['street'].tolist(), pairs['road_name_clean'].tolist(),
+            scorer=fuzz.token_set_ratio, score_cutoff=threshold,
+            dtype=np.float64, workers=FUZZY_MATCH_WORKERS
         )
-        for match_clean, score, _ in match_tuples:
-            if threshold <= score < 100:
-                original_matches = roads_gdf.loc[
-                    roads_gdf['FULLNAME_clean'] == match_clean,
-                    'FULLNAME'
-                ].unique()
-                for original_match in original_matches:
-                    potential_typos_list.append({
-                        'stop_id': stop_id,
-                        'stop_name': stop_name,
-                        'street_in_stop_name': street,
-                        'similar_road_name_clean': match_clean,
-                        'similar_road_name_original': original_match,
-                        'similarity_score': score
-                    })
-    return potential_typos_list
-
-potential_typos = []
-for _, stop in stops_gdf.iterrows():
-    s_id = stop['stop_id']
-    s_name = stop['stop_name']
-    s_streets = extract_street_names(s_name)
-    typos = compare_stop_to_roads(
-        s_id, s_name, s_streets,
-        road_names_clean, roadways_gdf, SIMILARITY_THRESHOLD
+    pairs['similarity_score'] = scores
+    candidates = candidates.merge(pairs, on=['street', 'road_name_clean'], how='left')
+
+    # Keep the three best roads for each stop street, in roadway order on ties
+    candidates = candidates.sort_values(
+        ['street_order', 'similarity_score', 'road_order'],
+        ascending=[True, False, True], kind='mergesort'
     )
-    potential_typos.extend(typos)
+    best = candidates[candidates.groupby('street_order').cumcount() < 3]
+    return best[(best['similarity_score'] >= threshold) & (best['similarity_score'] < 100)]
+
+# Stops often share names (platforms, directions), so extract each name's streets once
+unique_stop_names = stops_gdf['stop_name'].drop_duplicates()
+name_streets = extract_street_names(unique_stop_names)
+stop_street_rows = pd.DataFrame({
+    'stop': np.arange(len(stops_gdf)),
+    'stop_name': stops_gdf['stop_name'].to_numpy()
+}).merge(
+    pd.DataFrame({
+        'stop_name': unique_stop_names[name_streets.index].to_numpy(),
+        'street': name_streets.astype('category').array
+    }),
+    on='stop_name',
+    how='left'  # Keeps the stops' order, unlike an inner merge
+).dropna(subset=['street'])
+stop_street_rows['street_order'] = np.arange(len(stop_street_rows))
+
+# Cleaned names of the roadways near each stop, once per stop, skipping unnamed roadways
+nearby_road_names = roadways_gdf['FULLNAME_clean'].array.take(nearby_road_idx)
+has_road_name = np.asarray(nearby_road_names != '')
+nearby_road_pairs = pd.DataFrame({
+    'stop': nearby_stop_idx[has_road_name],
+    'road_name_clean': nearby_road_names[has_road_name],
+    'road_order': nearby_road_idx[has_road_name]
+}).sort_values(['stop', 'road_order']).drop_duplicates(['stop', 'road_name_clean'])
+
+best_matches = find_nearby_typos(
+    stop_street_rows, nearby_road_pairs, road_names_clean, SIMILARITY_THRESHOLD
+)
+typos_df = pd.DataFrame({
+    'stop_id': stops_gdf['stop_id'].to_numpy()[best_matches['stop']],
+    'stop_name': best_matches['stop_name'].to_numpy(),
+    'street_in_stop_name': best_matches['street'].to_numpy(),
+    'similar_road_name_clean': best_matches['road_name_clean'].to_numpy(),
+    'similar_road_name_original': best_matches['road_name_clean'].astype(object).map(
+        clean_to_originals
+    ).to_numpy(),
+    'similarity_score': best_matches['similarity_score'].to_numpy()
+}).explode('similar_road_name_original')
 
 logging.info(
     "Total potential typos found before deduplication: %d",
-    len(potential_typos)
+    len(typos_df)
 )
 
-typos_df = pd.DataFrame(potential_typos)
-typos_df_sorted = typos_df.sort_values(
-    by='similarity_score', ascending=False
-).drop_duplicates()
+# Drop duplicate rows before sorting so only the distinct typos are ordered
+typos_df_sorted = typos_df.drop_duplicates().sort_values(
+    by='similarity_score', ascending=False, kind='mergesort'
+)
 
 logging.info(
     "Total potential typos after deduplication: %d",
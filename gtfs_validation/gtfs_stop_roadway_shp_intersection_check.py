@@ -11,11 +11,16 @@ as shapefiles and CSV files.
 """
 
 import os
-from shapely.geometry import Point
 
 import geopandas as gpd
 import pandas as pd
 
+try:
+    import pyogrio  # pylint: disable=unused-import
+    GEO_IO_ENGINE = 'pyogrio'
+except ImportError:  # Fall back to geopandas' default Fiona engine
+    GEO_IO_ENGINE = None
+
 # ==============================
 # CONFIGURATION SECTION - CUSTOMIZE HERE
 # ==============================
@@ -58,32 +63,33 @@ if not os.path.isfile(STOPS_PATH):
     )
 
 # Read roadways shapefile
-roadways_gdf = gpd.read_file(ROADWAYS_PATH)
+roadways_gdf = gpd.read_file(ROADWAYS_PATH, engine=GEO_IO_ENGINE)
 
 # Read GTFS stops.txt into DataFrame
 stops_df = pd.read_csv(STOPS_PATH)
 
-# Create GeoDataFrame from stops_df
-geometry = [Point(xy) for xy in zip(stops_df.stop_lon, stops_df.stop_lat)]
-stops_gdf = gpd.GeoDataFrame(stops_df, geometry=geometry)
-
-# Set CRS for stops_gdf
-stops_gdf.set_crs(STOPS_CRS, inplace=True)
+# Create GeoDataFrame from stops_df, building all stop points in one vectorized call
+stops_gdf = gpd.GeoDataFrame(
+    stops_df,
+    geometry=gpd.points_from_xy(stops_df.stop_lon, stops_df.stop_lat),
+    crs=STOPS_CRS
+)
 
 # Reproject both datasets to the target CRS
 roadways_gdf = roadways_gdf.to_crs(TARGET_CRS)
 stops_gdf = stops_gdf.to_crs(TARGET_CRS)
 
+# Carry only the roadway geometry into the spatial joins so no roadway attributes
+# are copied, and so both joins reuse the spatial index built on this one frame
+roadway_geometries = roadways_gdf[['geometry']]
+
 # Perform spatial join to find stops that intersect roadways
 intersecting_stops = gpd.sjoin(
     stops_gdf,
-    roadways_gdf,
+    roadway_geometries,
     how='inner',
     predicate='intersects'
-)
-
-# Optional: keep only columns from stops_gdf
-intersecting_stops = intersecting_stops[stops_gdf.columns]
+).drop(columns='index_right')
 
 # Add 'x' and 'y' columns for coordinate reference
 intersecting_stops['x'] = intersecting_stops.geometry.x
@@ -93,44 +99,46 @@ def determine_conflict_depth(stops_gdf, roadways_gdf, buffer_distances):
     """
     Determines the depth of conflict between stops and roadways based on buffer distances.
 
-    For each buffer distance, buffers the roadways and performs a spatial join
-    to identify stops that intersect the buffered roadways. Updates the stops_gdf
-    with conflict indicators for each buffer distance.
+    A stop intersects a roadway buffered by a negative distance exactly when it lies
+    within the roadway at least that far from its edge. Rather than buffering the
+    roadways and joining once per distance, performs a single spatial join and
+    measures each stop's distance to the boundary of the roadways it falls within,
+    then compares the deepest one against every buffer distance.
 
     Args:
         stops_gdf (GeoDataFrame): GeoDataFrame containing stop locations.
-        roadways_gdf (GeoDataFrame): GeoDataFrame containing roadway geometries.
+        roadways_gdf (GeoDataFrame): GeoDataFrame containing roadway geometries;
+            passing the same frame used for other joins reuses its spatial index.
         buffer_distances (list): List of negative buffer distances in feet.
 
     Returns:
         GeoDataFrame: Updated stops_gdf with conflict depth indicators.
     """
-    for buffer_distance in buffer_distances:
-        # Buffer the roadways by the negative distance
-        roadways_buffered = roadways_gdf.copy()
-        roadways_buffered['geometry'] = roadways_buffered.geometry.buffer(buffer_distance)
-
-        # Remove invalid or empty geometries
-        roadways_buffered = roadways_buffered[~roadways_buffered.is_empty]
-        roadways_buffered = roadways_buffered[roadways_buffered.is_valid]
-
-        # Spatial join to find stops that intersect the buffered roadways
-        buffered_join = gpd.sjoin(
-            stops_gdf,
-            roadways_buffered[['geometry']],
-            how='left',
-            predicate='intersects'
-        )
+    # Spatial join to find the roadways each stop falls within
+    joined = gpd.sjoin(
+        stops_gdf[['geometry']],
+        roadways_gdf,
+        how='inner',
+        predicate='intersects'
+    )
 
+    # Depth of each stop inside each roadway, keeping the deepest per stop;
+    # only polygonal roadways keep an interior under a negative buffer
+    joined_roads = roadways_gdf.geometry.loc[joined['index_right']]
+    is_polygon = joined_roads.geom_type.isin(['Polygon', 'MultiPolygon']).to_numpy()
+    depths = joined.geometry.distance(joined_roads.boundary, align=False).where(is_polygon)
+    conflict_depth = depths.groupby(level=0).max().reindex(stops_gdf.index)
+
+    for buffer_distance in buffer_distances:
         # Create a column to indicate whether the stop intersects the buffered roadways
         column_name = f'conflict_{-buffer_distance}ft'
-        stops_gdf[column_name] = ~buffered_join['index_right'].isnull()
+        stops_gdf[column_name] = conflict_depth.ge(-buffer_distance).to_numpy()
     return stops_gdf
 
 # Determine depth of conflict and update intersecting_stops
 intersecting_stops = determine_conflict_depth(
     intersecting_stops,
-    roadways_gdf,
+    roadway_geometries,
     BUFFER_DISTANCES
 )
 
@@ -143,7 +151,7 @@ intersecting_stops = intersecting_stops.sort_values(
 
 # Save to shapefile
 output_shp_path = os.path.join(OUTPUT_DIR, OUTPUT_SHP_NAME)
-intersecting_stops.to_file(output_shp_path)
+intersecting_stops.to_file(output_shp_path, engine=GEO_IO_ENGINE)
 
 # Save to CSV
 output_csv_path = os.path.join(OUTPUT_DIR, OUTPUT_CSV_NAME)
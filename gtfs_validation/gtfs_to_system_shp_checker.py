@@ -11,10 +11,16 @@ distance allowance from their serving routes. The results are exported as CSV an
 
 import os
 
+import numpy as np
 import pandas as pd
 import geopandas as gpd
-from rapidfuzz import fuzz
-from shapely.geometry import Point
+from rapidfuzz import fuzz, process
+
+try:
+    import pyogrio  # pylint: disable=unused-import
+    GEO_IO_ENGINE = 'pyogrio'
+except ImportError:  # Fall back to geopandas' default Fiona engine
+    GEO_IO_ENGINE = None
 
 # ==============================
 # CONFIGURATION SECTION - CUSTOMIZE HERE
@@ -53,6 +59,19 @@ ROUTE_NAME_COLUMN = 'ROUTE_NAME'
 DISTANCE_ALLOWANCE = 100  # Modify this value as needed
 
 
+# FUZZY MATCHING SETTINGS
+
+# Threads used to score route name similarity; -1 uses all CPU cores
+FUZZY_MATCH_WORKERS = -1
+
+
+# PERFORMANCE SETTINGS
+
+# Rows of stop_times.txt parsed at a time; the file is streamed in chunks so peak
+# memory tracks the distinct stop-route pairs rather than the whole file
+STOP_TIMES_CHUNK_ROWS = 500_000
+
+
 # COORDINATE REFERENCE SYSTEM (CRS) SETTINGS
 
 # Input CRS for data (e.g., stops and shapefiles)
@@ -106,16 +125,27 @@ for file_path in [
     if not os.path.isfile(file_path):
         raise FileNotFoundError(f"Required GTFS file not found: {file_path}")
 
-routes_df = pd.read_csv(routes_txt_path)
-stops_df = pd.read_csv(stops_txt_path)
-trips_df = pd.read_csv(trips_txt_path)
-stop_times_df = pd.read_csv(stop_times_txt_path)
+# Read only the columns used below, keeping GTFS IDs as strings so zero-padded IDs
+# survive and every join compares like with like; routes.txt is kept whole because
+# all of its columns go into the route comparison export, and stop_times.txt is
+# streamed later when it is reduced to stop-route pairs
+routes_df = pd.read_csv(routes_txt_path, dtype={'route_id': str})
+stops_df = pd.read_csv(
+    stops_txt_path,
+    usecols=['stop_id', 'stop_name', 'stop_lat', 'stop_lon'],
+    dtype={'stop_id': str}
+)
+trips_df = pd.read_csv(
+    trips_txt_path,
+    usecols=['trip_id', 'route_id'],
+    dtype=str
+)
 
 # Read shapefile
 if not os.path.isfile(SHAPEFILE_PATH):
     raise FileNotFoundError(f"Shapefile not found: {SHAPEFILE_PATH}")
 
-shp_df = gpd.read_file(SHAPEFILE_PATH)
+shp_df = gpd.read_file(SHAPEFILE_PATH, engine=GEO_IO_ENGINE)
 
 # Set CRS for shapefile if not already set
 if shp_df.crs is None:
@@ -146,20 +176,43 @@ merged_df = pd.merge(
     suffixes=('_gtfs', '_shp')
 )
 
-# Compute variation scores
-merged_df['short_name_score'] = merged_df.apply(
-    lambda x: fuzz.ratio(
-        str(x['route_short_name_str']),
-        str(x[ROUTE_NUMBER_COLUMN + '_str'])
-    ),
-    axis=1
-)
-merged_df['long_name_score'] = merged_df.apply(
-    lambda x: fuzz.ratio(
-        str(x['route_long_name']),
-        str(x[ROUTE_NAME_COLUMN])
-    ),
-    axis=1
+# Compute variation scores, scoring each row's pair of names in one batched call;
+# missing names are compared as their string form, as str() would render them
+def pairwise_ratio(left, right):
+    """
+    Compute fuzz.ratio between the aligned elements of two Series.
+    Identical pairs, such as the join keys the merge paired up, score 100
+    without fuzzy scoring; only the remaining pairs are scored.
+
+    Parameters:
+        left (pd.Series): First names to compare.
+        right (pd.Series): Names to compare against, aligned by position with `left`.
+
+    Returns:
+        np.ndarray: Similarity score (0-100) for each pair.
+    """
+    left_str = left.astype(str).to_numpy()
+    right_str = right.astype(str).to_numpy()
+    differs = left_str != right_str
+
+    scores = np.full(len(left_str), 100.0)
+    if differs.any():
+        scores[differs] = process.cpdist(
+            left_str[differs].tolist(),
+            right_str[differs].tolist(),
+            scorer=fuzz.ratio,
+            dtype=np.float64,
+            workers=FUZZY_MATCH_WORKERS
+        )
+    return scores
+
+merged_df['short_name_score'] = pairwise_ratio(
+    merged_df['route_short_name_str'],
+    merged_df[ROUTE_NUMBER_COLUMN + '_str']
+)
+merged_df['long_name_score'] = pairwise_ratio(
+    merged_df['route_long_name'],
+    merged_df[ROUTE_NAME_COLUMN]
 )
 
 # Determine exact matches
@@ -197,14 +250,36 @@ print(f"Route comparison exported to {output_csv_path}")
 # Filter matched routes where short names are an exact match
 matched_routes = merged_df[merged_df['short_name_exact_match']].copy()
 
-# Get trips for matched routes
-matched_trips = trips_df[trips_df['route_id'].isin(matched_routes['route_id'])]
+# Resolve the route serving every stop_time once and keep each distinct stop-route
+# pair, in order of first appearance; the matched, unmatched and routes-serving-stop
+# steps below all filter this one small table by route. stop_times.txt is streamed
+# and each chunk is reduced to its pairs before the next one is read
+stop_times_chunks = pd.read_csv(
+    stop_times_txt_path,
+    usecols=['trip_id', 'stop_id'],
+    dtype=str,
+    chunksize=STOP_TIMES_CHUNK_ROWS
+)
+all_stop_route_pairs = pd.concat(
+    [
+        chunk.merge(
+            trips_df[['trip_id', 'route_id']],
+            on='trip_id',
+            how='left'
+        )[['stop_id', 'route_id']].drop_duplicates()
+        for chunk in stop_times_chunks
+    ],
+    ignore_index=True
+).drop_duplicates(ignore_index=True)
 
-# Get stop_times for matched trips
-matched_stop_times = stop_times_df[stop_times_df['trip_id'].isin(matched_trips['trip_id'])]
+# Get stop-route pairs on matched routes
+matched_route_ids = pd.Index(matched_routes['route_id'].unique())
+stop_route_pairs = all_stop_route_pairs[
+    all_stop_route_pairs['route_id'].isin(matched_route_ids)
+]
 
 # Get stops used in matched routes
-matched_stops = stops_df[stops_df['stop_id'].isin(matched_stop_times['stop_id'])].copy()
+matched_stops = stops_df[stops_df['stop_id'].isin(stop_route_pairs['stop_id'])].copy()
 
 # Convert stops to GeoDataFrame
 matched_stops['stop_lat'] = pd.to_numeric(
@@ -216,43 +291,33 @@ matched_stops['stop_lon'] = pd.to_numeric(
     errors='coerce'
 )
 matched_stops = matched_stops.dropna(subset=['stop_lat', 'stop_lon'])
-matched_stops['geometry'] = [
-    Point(xy) for xy in zip(matched_stops['stop_lon'], matched_stops['stop_lat'])
-]
 matched_stops_gdf = gpd.GeoDataFrame(
     matched_stops,
-    geometry='geometry',
+    geometry=gpd.points_from_xy(matched_stops['stop_lon'], matched_stops['stop_lat']),
     crs=INPUT_CRS
 )
 
-# Convert to projected CRS for accurate distance calculation
-matched_stops_gdf = matched_stops_gdf.to_crs(PROJECTED_CRS)
-shp_df = shp_df.to_crs(PROJECTED_CRS)
-
-# Rename geometry column in shapefile to 'route_geometry' (if not already)
-if 'route_geometry' not in shp_df.columns:
-    shp_df = shp_df.rename(columns={'geometry': 'route_geometry'})
+# Project copies of the geometries for accurate distance calculation; the stops keep
+# their input-CRS points for export, and only routes that matched are projected
+matched_stops_gdf['projected_geometry'] = matched_stops_gdf.geometry.to_crs(PROJECTED_CRS)
+matched_shp_df = shp_df[
+    shp_df[ROUTE_NUMBER_COLUMN + '_str'].isin(matched_routes[ROUTE_NUMBER_COLUMN + '_str'])
+]
+route_geometries_df = pd.DataFrame({
+    ROUTE_NUMBER_COLUMN + '_str': matched_shp_df[ROUTE_NUMBER_COLUMN + '_str'],
+    'route_geometry': matched_shp_df.geometry.to_crs(PROJECTED_CRS)
+})
 
 # Merge matched_routes with route geometries
 matched_routes = matched_routes.merge(
-    shp_df[[ROUTE_NUMBER_COLUMN + '_str', 'route_geometry']],
+    route_geometries_df,
     on=ROUTE_NUMBER_COLUMN + '_str',
     how='left'
 )
 
-# Merge stop_times with trips to get route IDs for stops
-matched_stop_times_trips = matched_stop_times.merge(
-    matched_trips[['trip_id', 'route_id']],
-    on='trip_id',
-    how='left'
-)
-
-# Get stop-route pairs
-stop_route_pairs = matched_stop_times_trips[['stop_id', 'route_id']].drop_duplicates()
-
 # Merge with stops GeoDataFrame to get geometry
 stop_route_pairs = stop_route_pairs.merge(
-    matched_stops_gdf[['stop_id', 'geometry']],
+    matched_stops_gdf[['stop_id', 'geometry', 'projected_geometry']],
     on='stop_id',
     how='left'
 )
@@ -264,25 +329,13 @@ stop_route_pairs = stop_route_pairs.merge(
     how='left'
 )
 
-# Calculate distance between stop and route
-def calculate_distance(row):
-    """
-    Calculate the distance between a stop and its route geometry in meters.
-
-    Parameters:
-        row (pd.Series): A row from the DataFrame containing 'geometry' and 'route_geometry'.
-
-    Returns:
-        float or None: Distance in meters if geometries are present, else None.
-    """
-    if pd.notnull(row['geometry']) and pd.notnull(row['route_geometry']):
-        return row['geometry'].distance(row['route_geometry'])
-    return None
-
-# Apply the distance calculation
-stop_route_pairs['distance_to_route_meters'] = stop_route_pairs.apply(
-    calculate_distance,
-    axis=1
+# Calculate distance between each stop and its route in one vectorized call;
+# pairs missing either geometry get a null distance
+stop_geometries = gpd.GeoSeries(stop_route_pairs['projected_geometry'], crs=PROJECTED_CRS)
+route_geometries = gpd.GeoSeries(stop_route_pairs['route_geometry'], crs=PROJECTED_CRS)
+stop_route_pairs['distance_to_route_meters'] = stop_geometries.distance(
+    route_geometries,
+    align=False
 )
 
 # Convert distance to feet
@@ -311,13 +364,15 @@ stops_not_within_allowance = stops_not_within_allowance.rename(
 
 # Identify stops without a matching route
 all_route_ids = routes_df['route_id'].unique()
-matched_route_ids = matched_routes['route_id'].unique()
 unmatched_route_ids = set(all_route_ids) - set(matched_route_ids)
 
 # Get stops from unmatched routes
-unmatched_trips = trips_df[trips_df['route_id'].isin(unmatched_route_ids)]
-unmatched_stop_times = stop_times_df[stop_times_df['trip_id'].isin(unmatched_trips['trip_id'])]
-unmatched_stops = stops_df[stops_df['stop_id'].isin(unmatched_stop_times['stop_id'])].copy()
+unmatched_stop_route_pairs = all_stop_route_pairs[
+    all_stop_route_pairs['route_id'].isin(unmatched_route_ids)
+]
+unmatched_stops = stops_df[
+    stops_df['stop_id'].isin(unmatched_stop_route_pairs['stop_id'])
+].copy()
 
 # Convert unmatched stops to GeoDataFrame
 unmatched_stops['stop_lat'] = pd.to_numeric(
@@ -329,38 +384,33 @@ unmatched_stops['stop_lon'] = pd.to_numeric(
     errors='coerce'
 )
 unmatched_stops = unmatched_stops.dropna(subset=['stop_lat', 'stop_lon'])
-unmatched_stops['geometry'] = [
-    Point(xy) for xy in zip(unmatched_stops['stop_lon'], unmatched_stops['stop_lat'])
-]
 unmatched_stops_gdf = gpd.GeoDataFrame(
     unmatched_stops,
-    geometry='geometry',
+    geometry=gpd.points_from_xy(unmatched_stops['stop_lon'], unmatched_stops['stop_lat']),
     crs=INPUT_CRS
 )
-unmatched_stops_gdf = unmatched_stops_gdf.to_crs(PROJECTED_CRS)
 
 # Add reason and distance columns
 unmatched_stops_gdf['reason'] = 'No matching route'
 unmatched_stops_gdf['distance_to_route_feet'] = None  # No route to calculate distance
 
-# Combine stop_times with trips and routes to get route_short_name for each stop
-stop_times_trips = stop_times_df[['stop_id', 'trip_id']].merge(
-    trips_df[['trip_id', 'route_id']],
-    on='trip_id',
-    how='left'
-)
-stop_times_trips_routes = stop_times_trips.merge(
+# Combine stop-route pairs with route_short_name for each stop
+stop_route_names = all_stop_route_pairs.merge(
     routes_df[['route_id', 'route_short_name']],
     on='route_id',
     how='left'
 )
 
-# Group by stop_id and aggregate route_short_names
-stop_routes_df = stop_times_trips_routes.groupby('stop_id')['route_short_name'].unique().reset_index()
-stop_routes_df['routes_serving_stop'] = stop_routes_df['route_short_name'].apply(
-    lambda x: ', '.join(map(str, x))
+# Group by stop_id and join each stop's distinct route_short_names in order of appearance,
+# deduplicating the pairs and casting to strings once rather than per stop
+stop_routes_df = (
+    stop_route_names[['stop_id', 'route_short_name']]
+    .drop_duplicates()
+    .astype({'route_short_name': str})
+    .groupby('stop_id')['route_short_name']
+    .agg(', '.join)
+    .reset_index(name='routes_serving_stop')
 )
-stop_routes_df = stop_routes_df[['stop_id', 'routes_serving_stop']]
 
 # Merge routes_serving_stop into problem stops
 stops_not_within_allowance = stops_not_within_allowance.merge(
@@ -404,14 +454,14 @@ problem_stops_gdf = pd.concat(
 # Remove duplicates
 problem_stops_gdf = problem_stops_gdf.drop_duplicates(subset='stop_id')
 
-# Ensure it's a GeoDataFrame
+# Ensure it's a GeoDataFrame; the stop points are still in the input CRS
 problem_stops_gdf = gpd.GeoDataFrame(
     problem_stops_gdf,
     geometry='geometry',
-    crs=PROJECTED_CRS
+    crs=INPUT_CRS
 )
 
-# Reproject back to output CRS for compatibility (optional)
+# Reproject to output CRS for compatibility (a no-op when it matches the input CRS)
 problem_stops_gdf = problem_stops_gdf.to_crs(OUTPUT_CRS)
 
 # Export problem stops to shapefile
@@ -419,5 +469,5 @@ OUTPUT_SHP_PATH = os.path.join(
     OUTPUT_DIR,
     'problem_stops.shp'
 )
-problem_stops_gdf.to_file(OUTPUT_SHP_PATH)
+problem_stops_gdf.to_file(OUTPUT_SHP_PATH, engine=GEO_IO_ENGINE)
 print(f"Problem stops were exported to {OUTPUT_SHP_PATH}!")